@@ -4,15 +4,21 @@
 # and automate spreadsheet workflows.
 # Date : 3rd Jan 2026
 import os
-import json
+import re
+import sys
+import datetime
+import functools
+import mmap
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from mcp.server.fastmcp import FastMCP
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+import orjson
 import pickle
 
+# Google client libraries are imported inside the functions that use them, so
+# starting the server does not pay for importing them before the first tool call
+
 # Scopes for Google Sheets and Forms
 SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
@@ -20,51 +26,267 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive.readonly'
 ]
 
+# Token file next to this script, storing the user's access and refresh tokens
+TOKEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'token.pickle')
+
+# Refresh access tokens this many seconds before they expire; google-auth
+# already treats tokens as expired 3m45s early, so this has to be larger
+REFRESH_MARGIN_SECONDS = 300
+
+# Maximum number of rows sent to the Sheets API in a single write request
+WRITE_CHUNK_ROWS = 5000
+
+# Largest page size accepted by the Drive files.list endpoint
+DRIVE_MAX_PAGE_SIZE = 1000
+
 # Initialize FastMCP server
 mcp = FastMCP("gsheets")
 
-def get_credentials():
-    """Get Google API credentials"""
-    creds = None
+# Credentials shared by every Google service, loaded on first use
+_creds = None
+_creds_lock = threading.Lock()
+
+def _build_once(factory):
+    """Memoize a zero-argument factory so that concurrent first calls build a single object"""
+    lock = threading.Lock()
+    built = []
+
+    @functools.wraps(factory)
+    def wrapper():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+
+    return wrapper
+
+def _dump(obj):
+    """Serialize a tool result to a compact JSON string"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+def _load_token(token_path):
+    """Load pickled credentials from the token file via a read-only mmap"""
+    fd = os.open(token_path, os.O_RDONLY)
+    try:
+        if os.fstat(fd).st_size == 0:
+            return None
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            return pickle.loads(mm)
+    finally:
+        os.close(fd)
+
+def _save_token(token_path, creds):
+    """Pickle credentials to the token file, readable only by the current user"""
+    data = memoryview(pickle.dumps(creds, protocol=pickle.HIGHEST_PROTOCOL))
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(token_path, flags, 0o600)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+@_build_once
+def _get_auth_request():
+    """Get the token refresh transport, shared so refreshes reuse one connection pool"""
+    import requests
+    from google.auth.transport.requests import Request
+    return Request(session=requests.Session())
+
+def _load_credentials(interactive=True):
+    """
+    Load Google API credentials from the token file, refreshing or logging in as needed
 
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    token_path = os.path.join(script_dir, 'token.pickle')
+    Returns None instead of starting the browser login flow when interactive is False
+    """
+    creds = None
 
     # Token file stores the user's access and refresh tokens
-    if os.path.exists(token_path):
-        with open(token_path, 'rb') as token:
-            creds = pickle.load(token)
+    if os.path.exists(TOKEN_PATH):
+        creds = _load_token(TOKEN_PATH)
 
     # If no valid credentials, let user log in
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+            creds.refresh(_get_auth_request())
+        elif not interactive:
+            return None
         else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
             credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', 'credentials.json')
             flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
             creds = flow.run_local_server(port=0)
 
         # Save credentials for next run
-        with open(token_path, 'wb') as token:
-            pickle.dump(creds, token)
+        _save_token(TOKEN_PATH, creds)
 
     return creds
 
-def get_sheets_service():
-    """Get Google Sheets service"""
+def _schedule_refresh(creds):
+    """Refresh the credentials on a background timer shortly before they expire"""
+    if not creds.expiry or not creds.refresh_token:
+        return
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    delay = (creds.expiry - now).total_seconds() - REFRESH_MARGIN_SECONDS
+
+    timer = threading.Timer(max(delay, 0), _refresh_credentials, args=(creds,))
+    timer.daemon = True
+    timer.start()
+
+def _refresh_credentials(creds):
+    """Timer callback: refresh the credentials and schedule the next refresh"""
+    with _creds_lock:
+        try:
+            creds.refresh(_get_auth_request())
+        except Exception as e:
+            # Stop refreshing in the background; requests still refresh on demand
+            print(f"Could not refresh Google credentials: {e}", file=sys.stderr)
+            return
+
+        # Save the refreshed token for the next run, as the request-path refresh does
+        try:
+            _save_token(TOKEN_PATH, creds)
+        except OSError as e:
+            print(f"Could not save refreshed Google credentials: {e}", file=sys.stderr)
+
+    _schedule_refresh(creds)
+
+def get_credentials(interactive=True):
+    """
+    Get Google API credentials (loaded once and shared by all services)
+
+    Returns None if the user would have to log in and interactive is False
+    """
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            creds = _load_credentials(interactive)
+            if creds is None:
+                return None
+            _creds = creds
+            _schedule_refresh(_creds)
+        return _creds
+
+@_build_once
+def get_authorized_http():
+    """Get an authorized HTTP transport shared by all Google services"""
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
     creds = get_credentials()
-    return build('sheets', 'v4', credentials=creds)
+    return AuthorizedHttp(creds, http=httplib2.Http(timeout=30))
+
+@_build_once
+def _get_json_model():
+    """Get a googleapiclient JsonModel that parses API responses with orjson"""
+    from googleapiclient.model import JsonModel
+
+    class OrjsonModel(JsonModel):
+        def deserialize(self, content):
+            try:
+                body = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                return JsonModel.deserialize(self, content)
+            if self._data_wrapper and isinstance(body, dict) and 'data' in body:
+                body = body['data']
+            return body
+
+    return OrjsonModel()
+
+def _build_service(name, version):
+    """Build a Google API service from the discovery document bundled with googleapiclient"""
+    from googleapiclient.discovery import build
+    return build(name, version, http=get_authorized_http(), model=_get_json_model(),
+                 static_discovery=True, cache_discovery=False)
+
+@_build_once
+def get_sheets_service():
+    """Get Google Sheets service (built once per process)"""
+    return _build_service('sheets', 'v4')
 
+@_build_once
 def get_forms_service():
-    """Get Google Forms service"""
-    creds = get_credentials()
-    return build('forms', 'v1', credentials=creds)
+    """Get Google Forms service (built once per process)"""
+    return _build_service('forms', 'v1')
 
+@_build_once
 def get_drive_service():
-    """Get Google Drive service"""
-    creds = get_credentials()
-    return build('drive', 'v3', credentials=creds)
+    """Get Google Drive service (built once per process)"""
+    return _build_service('drive', 'v3')
+
+def warm_services():
+    """Load saved credentials, then build the Sheets, Forms and Drive services in parallel"""
+    # Never start the browser login here: it writes to stdout, which belongs to the
+    # stdio transport. Without a usable token.pickle, login waits for the first tool call
+    if get_credentials(interactive=False) is None:
+        return
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(getter) for getter in
+                   (get_sheets_service, get_forms_service, get_drive_service)]
+        for future in futures:
+            future.result()
+
+
+def _quote_sheet_name(title):
+    """Quote a sheet title for use as the sheet part of an A1 range"""
+    return "'" + title.replace("'", "''") + "'"
+
+def _unquote_sheet_name(name):
+    """Strip the quotes from a quoted A1 sheet name ("'Bob''s'" -> "Bob's")"""
+    if len(name) >= 2 and name[0] == name[-1] == "'":
+        return name[1:-1].replace("''", "'")
+    return name
+
+def _split_range(range_name):
+    """Split an A1 range into (sheet, cells) on the last '!' outside a quoted sheet name"""
+    split_at = -1
+    in_quotes = False
+    for i, char in enumerate(range_name):
+        if char == "'":
+            # An escaped quote ('') toggles twice and leaves the state unchanged
+            in_quotes = not in_quotes
+        elif char == '!' and not in_quotes:
+            split_at = i
+
+    if split_at < 0:
+        return '', range_name
+    return range_name[:split_at], range_name[split_at + 1:]
+
+def _get_sheet_titles(service, spreadsheet_id):
+    """Get the titles of all sheets (tabs) in a spreadsheet"""
+    metadata = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties.title'
+    ).execute()
+    return {s['properties']['title'] for s in metadata.get('sheets', [])}
+
+# Start of the cell part of an A1 range: optional column letters, optional row number,
+# optionally followed by the end of the range (e.g. "B2", "A:C", "A1:C10", "3:5")
+_A1_START = re.compile(r'([A-Za-z]{1,3})?(\d+)?(?::.*)?')
+
+def _offset_range(range_name, row_offset, sheet_titles):
+    """Get the A1 start cell row_offset rows below the start of range_name"""
+    sheet, cells = _split_range(range_name)
+    if not sheet and _unquote_sheet_name(cells) in sheet_titles:
+        # A bare (possibly quoted) sheet name refers to the whole sheet, starting at A1
+        sheet, cells = _quote_sheet_name(_unquote_sheet_name(cells)), ''
+
+    # Anything else without a sheet prefix is a cell reference on the same default
+    # sheet the API uses for the first chunk, so it is offset without a prefix too
+    match = _A1_START.fullmatch(cells)
+    if match is None:
+        raise ValueError(f"Cannot split range {range_name!r}: {cells!r} is not an A1 cell reference")
+
+    column = match.group(1) or 'A'
+    row = int(match.group(2) or 1) + row_offset
+    return f"{sheet}!{column}{row}" if sheet else f"{column}{row}"
+
+def _chunk_rows(values):
+    """Split a 2D list of values into (row_offset, rows) chunks of at most WRITE_CHUNK_ROWS rows"""
+    for start in range(0, max(len(values), 1), WRITE_CHUNK_ROWS):
+        yield start, values[start:start + WRITE_CHUNK_ROWS]
 
 
 @mcp.tool()
@@ -79,42 +301,153 @@ def list_spreadsheets(max_results: int = 20) -> str:
         JSON string with spreadsheet names, IDs, and URLs
     """
     service = get_drive_service()
-    results = service.files().list(
+    files_api = service.files()
+    request = files_api.list(
         q="mimeType='application/vnd.google-apps.spreadsheet'",
-        pageSize=max_results,
-        fields="files(id, name, webViewLink)"
-    ).execute()
+        pageSize=min(max_results, DRIVE_MAX_PAGE_SIZE),
+        fields="nextPageToken, files(id, name, webViewLink)"
+    )
 
-    files = results.get('files', [])
-    spreadsheets = [{
-        'name': f['name'],
-        'id': f['id'],
-        'url': f['webViewLink']
-    } for f in files]
+    # Follow nextPageToken until enough spreadsheets have been collected
+    spreadsheets = []
+    while request is not None and len(spreadsheets) < max_results:
+        results = request.execute()
+        spreadsheets.extend({
+            'name': f['name'],
+            'id': f['id'],
+            'url': f['webViewLink']
+        } for f in results.get('files', []))
+        request = files_api.list_next(request, results)
 
-    return json.dumps(spreadsheets, indent=2)
+    del spreadsheets[max_results:]
+    return _dump(spreadsheets)
 
 
 @mcp.tool()
-def read_sheet(spreadsheet_id: str, range_name: str = "Sheet1") -> str:
+def read_sheet(spreadsheet_id: str, range_name: str | list[str] = "Sheet1") -> str:
     """
     Read data from a Google Sheet
 
     Args:
         spreadsheet_id: The ID of the spreadsheet (from the URL)
-        range_name: The A1 notation of the range to read (default: Sheet1)
+        range_name: The A1 notation of the range to read (default: Sheet1),
+            or a list of ranges to read in a single request
 
     Returns:
-        JSON string with the sheet data
+        JSON string with the sheet data: a 2D list of rows when range_name is a
+        single range, or a list of {"range", "values"} objects (one per requested
+        range, values being a 2D list of rows) when range_name is a list.
+        Cell values are unformatted: numbers, percentages and currency come back as
+        plain numbers, while dates and times come back as formatted strings.
     """
+    if isinstance(range_name, list):
+        return read_sheets_batch(spreadsheet_id, range_name)
+
     service = get_sheets_service()
     result = service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
-        range=range_name
+        range=range_name,
+        valueRenderOption='UNFORMATTED_VALUE',
+        dateTimeRenderOption='FORMATTED_STRING',
+        fields='values'
     ).execute()
 
     values = result.get('values', [])
-    return json.dumps(values, indent=2)
+    return _dump(values)
+
+
+@mcp.tool()
+def read_sheets_batch(spreadsheet_id: str, ranges: list[str]) -> str:
+    """
+    Read several ranges from a Google Sheet in a single request
+
+    Args:
+        spreadsheet_id: The ID of the spreadsheet (from the URL)
+        ranges: List of A1 notation ranges to read
+
+    Returns:
+        JSON string with one entry (range and values) per requested range.
+        Cell values are unformatted: numbers, percentages and currency come back as
+        plain numbers, while dates and times come back as formatted strings.
+    """
+    service = get_sheets_service()
+    result = service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        valueRenderOption='UNFORMATTED_VALUE',
+        dateTimeRenderOption='FORMATTED_STRING',
+        fields='valueRanges(range,values)'
+    ).execute()
+
+    value_ranges = result.get('valueRanges', [])
+    return _dump(value_ranges)
+
+
+@mcp.tool()
+def summarize_sheet(spreadsheet_id: str, sheet_name: str = "", sample_rows: int = 50) -> str:
+    """
+    Summarize a Google Sheet without downloading all of its data
+
+    Args:
+        spreadsheet_id: The ID of the spreadsheet (from the URL)
+        sheet_name: The sheet (tab) to summarize (default: the first sheet)
+        sample_rows: Number of data rows after the header row to include (default: 50)
+
+    Returns:
+        JSON string with the sheet titles, grid size (row and column counts, which
+        include empty rows and columns), header row, and a sample of data rows.
+        Cell values are unformatted: numbers, percentages and currency come back as
+        plain numbers, while dates and times come back as formatted strings.
+    """
+    service = get_sheets_service()
+    metadata = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties(title,gridProperties(rowCount,columnCount))'
+    ).execute()
+
+    sheets = [s['properties'] for s in metadata.get('sheets', [])]
+    if sheet_name:
+        sheets_by_title = {p['title']: p for p in sheets}
+        if sheet_name not in sheets_by_title:
+            raise ValueError(f"Sheet '{sheet_name}' not found in spreadsheet {spreadsheet_id}")
+        properties = sheets_by_title[sheet_name]
+    else:
+        properties = sheets[0]
+
+    # Fetch only the header row and the first sample_rows data rows
+    title = _quote_sheet_name(properties['title'])
+    ranges = [f"{title}!1:1"]
+    if sample_rows > 0:
+        ranges.append(f"{title}!2:{sample_rows + 1}")
+
+    result = service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        valueRenderOption='UNFORMATTED_VALUE',
+        dateTimeRenderOption='FORMATTED_STRING',
+        fields='valueRanges(values)'
+    ).execute()
+
+    # batchGet returns one entry per requested range, in request order
+    value_ranges = result.get('valueRanges', [])
+    if len(value_ranges) != len(ranges):
+        raise RuntimeError(
+            f"Expected {len(ranges)} value ranges from batchGet, got {len(value_ranges)}"
+        )
+
+    header_range, *sample_ranges = value_ranges
+    headers = header_range.get('values', [[]])[0]
+    sample = sample_ranges[0].get('values', []) if sample_ranges else []
+    grid = properties.get('gridProperties', {})
+
+    return _dump({
+        'sheets': [p['title'] for p in sheets],
+        'sheet': properties['title'],
+        'row_count': grid.get('rowCount'),
+        'column_count': grid.get('columnCount'),
+        'headers': headers,
+        'sample': sample
+    })
 
 
 @mcp.tool()
@@ -130,17 +463,55 @@ def write_sheet(spreadsheet_id: str, range_name: str, values: list) -> str:
     Returns:
         Confirmation message
     """
-    service = get_sheets_service()
-    body = {'values': values}
+    return batch_write_sheet(spreadsheet_id, [{'range': range_name, 'values': values}])
 
-    result = service.spreadsheets().values().update(
-        spreadsheetId=spreadsheet_id,
-        range=range_name,
-        valueInputOption='RAW',
-        body=body
-    ).execute()
 
-    return f"Updated {result.get('updatedCells')} cells"
+@mcp.tool()
+def batch_write_sheet(spreadsheet_id: str, data: list[dict]) -> str:
+    """
+    Write data to several ranges of a Google Sheet in a single request
+    (payloads over 5000 rows are split across several requests)
+
+    Args:
+        spreadsheet_id: The ID of the spreadsheet
+        data: List of objects, each with a 'range' (A1 notation of where to write)
+            and 'values' (2D list of values to write)
+
+    Returns:
+        Confirmation message
+    """
+    service = get_sheets_service()
+
+    # A range without a sheet prefix may be a bare sheet title or a cell reference;
+    # the sheet titles tell the two apart when such a range has to be split
+    sheet_titles = set()
+    if any(len(d['values']) > WRITE_CHUNK_ROWS and not _split_range(d['range'])[0] for d in data):
+        sheet_titles = _get_sheet_titles(service, spreadsheet_id)
+
+    # Split large regions so no single request carries more than WRITE_CHUNK_ROWS rows
+    chunks = [{
+        'range': _offset_range(d['range'], start, sheet_titles) if start else d['range'],
+        'values': rows
+    } for d in data for start, rows in _chunk_rows(d['values'])]
+
+    requests_data = [[]]
+    rows_in_request = 0
+    for chunk in chunks:
+        if requests_data[-1] and rows_in_request + len(chunk['values']) > WRITE_CHUNK_ROWS:
+            requests_data.append([])
+            rows_in_request = 0
+        requests_data[-1].append(chunk)
+        rows_in_request += len(chunk['values'])
+
+    updated_cells = 0
+    for request_data in requests_data:
+        result = service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'RAW', 'data': request_data}
+        ).execute()
+        updated_cells += result.get('totalUpdatedCells', 0)
+
+    return f"Updated {updated_cells} cells"
 
 
 @mcp.tool()
@@ -157,16 +528,19 @@ def append_sheet(spreadsheet_id: str, range_name: str, values: list) -> str:
         Confirmation message
     """
     service = get_sheets_service()
-    body = {'values': values}
 
-    result = service.spreadsheets().values().append(
-        spreadsheetId=spreadsheet_id,
-        range=range_name,
-        valueInputOption='RAW',
-        body=body
-    ).execute()
+    # Append large payloads in order, WRITE_CHUNK_ROWS rows per request
+    updated_cells = 0
+    for _, rows in _chunk_rows(values):
+        result = service.spreadsheets().values().append(
+            spreadsheetId=spreadsheet_id,
+            range=range_name,
+            valueInputOption='RAW',
+            body={'values': rows}
+        ).execute()
+        updated_cells += result.get('updates', {}).get('updatedCells', 0)
 
-    return f"Appended {result.get('updates').get('updatedCells')} cells"
+    return f"Appended {updated_cells} cells"
 
 
 @mcp.tool()
@@ -189,10 +563,10 @@ def create_spreadsheet(title: str) -> str:
 
     result = service.spreadsheets().create(body=spreadsheet).execute()
 
-    return json.dumps({
+    return _dump({
         'spreadsheet_id': result.get('spreadsheetId'),
         'url': result.get('spreadsheetUrl')
-    }, indent=2)
+    })
 
 
 @mcp.tool()
@@ -220,10 +594,10 @@ def create_form(title: str, description: str = "") -> str:
 
     result = service.forms().create(body=form).execute()
 
-    return json.dumps({
+    return _dump({
         'form_id': result.get('formId'),
         'url': result.get('responderUri')
-    }, indent=2)
+    })
 
 
 # Resources - provide access to sheet data
@@ -242,17 +616,16 @@ def get_sheet_resource(spreadsheet_id: str, range_name: str = "Sheet1") -> str:
     service = get_sheets_service()
     result = service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
-        range=range_name
+        range=range_name,
+        valueRenderOption='FORMATTED_VALUE',
+        fields='values'
     ).execute()
 
     values = result.get('values', [])
 
-    # Format as readable text
-    output = []
-    for row in values:
-        output.append(' | '.join(str(cell) for cell in row))
-
-    return '\n'.join(output)
+    # Format as readable text; formatted values are already strings, so rows
+    # can be joined directly without a per-cell str() call
+    return '\n'.join(map(' | '.join, values))
 
 
 # Prompt templates
@@ -263,7 +636,8 @@ def analyze_sheet_data():
 
 1. **Data Retrieval & Overview**
    - Ask me for the spreadsheet name and range (or help me list my spreadsheets if needed), unless the user has already retrieved a spreadsheet
-   - Read the sheet data using the read_sheet tool
+   - Call the summarize_sheet tool first to get the sheet size, column headers, and a sample of rows
+   - Only read the full sheet data with the read_sheet tool when the analysis needs every row
    - Provide a high-level summary:
      * Total number of rows and columns
      * Column headers/names
@@ -387,6 +761,19 @@ def form_to_sheet():
 Please provide all URLs and IDs clearly formatted for easy access."""
 
 
+def _warm_services_in_background():
+    """Thread target: warm the services, reporting failures on stderr"""
+    try:
+        warm_services()
+    except Exception as e:
+        # The services are built (and the error reported) on first use instead
+        print(f"Could not initialize Google services: {e}", file=sys.stderr)
+
+
 if __name__ == "__main__":
+    # Build the services in the background so the first tool call doesn't pay for it,
+    # without delaying the server's response to initialize and tools/list
+    threading.Thread(target=_warm_services_in_background, daemon=True).start()
+
     # Run the server with stdio transport
     mcp.run(transport='stdio')
\ No newline at end of file